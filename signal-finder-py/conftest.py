@@ -0,0 +1 @@
+# Lets tests import `services` the same way main.py does
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import httpx
 from dotenv import load_dotenv
@@ -17,27 +18,35 @@ from services.models import (
 from services.search import SearchAllApis
 from services.llm import (
     llmGetAppDescriptionFromWebsite,
-    llmAnalyzeCustomerSegment,
-    llmExtractPainPoints,
+    llmExtractSegmentAndPains,
     llmGenerateGtmTopicForApp,
     llmGenerateSearchKeywords,
     llmFilterPosts,
     llmGenerateResponse,
-    llmGenerateResponseStream
+    llmGenerateResponseStream,
+    setLlmCacheBypass
 )
 from services.utils import dedupe_by_url
-from services.rank import rank_posts_by_intent
-
-load_dotenv()
+from services.rank import score_posts_by_intent
 
 app = FastAPI(title="Intent Finder API", version="1.0")
 
+# Posts returned by /search
+MAX_SEARCH_RESULTS = 15
+
 # Shared HTTP client for connection pooling
 @app.on_event("startup")
 async def startup():
+    # HTTP/2 multiplexes the gathered CSE/OpenAI calls over a few connections;
+    # a longer keepalive avoids TLS re-handshakes between bursts.
+    # Limits and http2 live on the transport (the client ignores them when a transport is given).
     app.state.http = httpx.AsyncClient(
-        timeout=60.0,
-        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=1,  # retry once on connection errors (e.g. dropped TLS)
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=30.0)
+        )
     )
 
 @app.on_event("shutdown")
@@ -53,9 +62,11 @@ def root_page():
     return FileResponse(path)
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint for deployment platforms"""
-    return {"status": "healthy", "service": "Intent Finder API"}
+    # event_loop confirms uvloop is active (uvicorn --loop uvloop); stdlib shows _UnixSelectorEventLoop
+    loop = type(asyncio.get_running_loop())
+    return {"status": "healthy", "service": "Intent Finder API", "event_loop": f"{loop.__module__}.{loop.__name__}"}
 
 app.add_middleware(
     CORSMiddleware,
@@ -64,8 +75,9 @@ app.add_middleware(
 )
 # ---- Routes mapping 1:1 to your design ----
 @app.post("/extract", response_model=ExtractResp)
-async def extract(req: ExtractReq, request: Request):
+async def extract(req: ExtractReq, request: Request, nocache: bool = False):
     try:
+        setLlmCacheBypass(nocache)
         http = get_http(request)
         if req.url.startswith('manual:'):
             # Handle manual text input
@@ -74,15 +86,16 @@ async def extract(req: ExtractReq, request: Request):
             # Handle URL extraction
             description = await llmGetAppDescriptionFromWebsite(req.url, http)
         
-        customer_segment = await llmAnalyzeCustomerSegment(description, http)
-        pain_points = await llmExtractPainPoints(description, http)
-        return ExtractResp(description=description, customer_segment=customer_segment, pain_points=pain_points)
+        # Segment and pain points come from one combined call on the description
+        details = await llmExtractSegmentAndPains(description, http)
+        return ExtractResp(description=description, customer_segment=details.customer_segment, pain_points=details.pain_points)
     except Exception as e:
         raise HTTPException(500, str(e))
 
 @app.post("/gtm-topics", response_model=GTMResp)
-async def gtm_topics(req: GTMReq, request: Request):
+async def gtm_topics(req: GTMReq, request: Request, nocache: bool = False):
     try:
+        setLlmCacheBypass(nocache)
         http = get_http(request)
         topics = await llmGenerateGtmTopicForApp(req.description, http)
         return GTMResp(topics=topics)
@@ -90,8 +103,9 @@ async def gtm_topics(req: GTMReq, request: Request):
         raise HTTPException(500, str(e))
 
 @app.post("/keywords", response_model=KeywordsResp)
-async def keywords(req: KeywordsReq, request: Request):
+async def keywords(req: KeywordsReq, request: Request, nocache: bool = False):
     try:
+        setLlmCacheBypass(nocache)
         http = get_http(request)
         queries = await llmGenerateSearchKeywords(req.topic, req.description, http)
         return KeywordsResp(queries=queries)
@@ -99,8 +113,9 @@ async def keywords(req: KeywordsReq, request: Request):
         raise HTTPException(500, str(e))
 
 @app.post("/search", response_model=SearchResp)
-async def search(req: SearchReq, request: Request):
+async def search(req: SearchReq, request: Request, nocache: bool = False):
     try:
+        setLlmCacheBypass(nocache)
         http = get_http(request)
         posts = await SearchAllApis(req.queries, req.per_query, http)
         print(f"DEBUG: Found {len(posts)} raw posts")
@@ -111,34 +126,46 @@ async def search(req: SearchReq, request: Request):
             return SearchResp(posts=[])
         
         # Stage 1: Deterministic ranking to reduce LLM load
-        top_candidates = rank_posts_by_intent(unique, req.queries, top_n=60)
+        scored = score_posts_by_intent(unique, req.queries, top_n=60)
+        top_candidates = [p for _, _, p in scored]
         print(f"DEBUG: Ranked top {len(top_candidates)} posts by heuristics")
         
         # Show sample posts
         for i, p in enumerate(top_candidates[:3]):
             print(f"DEBUG: Top post {i+1}: {p.source} - {p.title[:50]}...")
         
-        # Stage 2: LLM filtering on top candidates only (saves tokens!)
-        judged = await llmFilterPosts(req.topic, [{"title":p.title,"snippet":p.snippet,"url":p.url} for p in top_candidates], http)
+        # Stage 2: Clearly relevant/irrelevant posts skip the LLM; only the ambiguous middle band is judged
+        auto_keep = [p for _, band, p in scored if band == "keep"]
+        ambiguous = [p for _, band, p in scored if band == "judge"]
+        print(f"DEBUG: Auto-kept {len(auto_keep)}, auto-dropped {len(scored) - len(auto_keep) - len(ambiguous)}")
+        
+        # Auto-kept posts come first, so once they fill the response the judge's verdicts would be discarded
+        if len(auto_keep) >= MAX_SEARCH_RESULTS:
+            ambiguous = []
+        print(f"DEBUG: Sending {len(ambiguous)} posts to LLM")
+        judged = await llmFilterPosts(req.topic, [{"title":p.title,"snippet":p.snippet,"url":p.url} for p in ambiguous], http) if ambiguous else []
         print(f"DEBUG: LLM judged {len(judged)} posts")
         
-        keep = {j.url for j in judged if j.keep}
-        print(f"DEBUG: Keeping {len(keep)} posts after LLM filtering")
+        # Auto-kept posts first (highest heuristic scores), then the LLM's picks in judged order.
+        # Judge ids index into `ambiguous`, so no URL matching is needed.
+        kept_ids = dict.fromkeys(j.id for j in judged if j.keep)
+        kept = auto_keep + [ambiguous[i] for i in kept_ids]
+        print(f"DEBUG: Keeping {len(kept)} posts after LLM filtering")
         
-        if len(keep) == 0:
+        if not kept:
             print("DEBUG: No posts passed LLM filter, returning top 3 by heuristic score")
             return SearchResp(posts=top_candidates[:3])
         
-        # Return top 15 that passed LLM filter, maintaining heuristic rank order
-        top15 = [p for p in top_candidates if p.url in keep][:15]
-        return SearchResp(posts=top15)
+        # Return the top posts that passed the filter
+        return SearchResp(posts=kept[:MAX_SEARCH_RESULTS])
     except Exception as e:
         print(f"DEBUG: Search error: {e}")
         raise HTTPException(500, str(e))
 
 @app.post("/reply", response_model=ReplyResp)
-async def reply(req: ReplyReq, request: Request):
+async def reply(req: ReplyReq, request: Request, nocache: bool = False):
     try:
+        setLlmCacheBypass(nocache)
         http = get_http(request)
         text = await llmGenerateResponse(req.topic, {"title": req.post.title, "snippet": req.post.snippet, "url": str(req.post.url)}, http)
         return ReplyResp(response=text)
@@ -4,4 +4,4 @@ export PYTHONUNBUFFERED=1
 set -a
 source .env
 set +a
-uvicorn main:app --reload --port 8000
+uvicorn main:app --reload --port 8000 --loop uvloop
@@ -1,99 +1,218 @@
-import os, httpx, json
-from typing import List, Dict
+import asyncio, functools, hashlib, os, httpx, orjson
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Tuple, Type
 from dotenv import load_dotenv
-from .models import Post, JudgeItem
+from pydantic import BaseModel, ValidationError
+from .models import Post, JudgeItem, ExtractDetails, TopicsOut, QueriesOut, JudgeOut
+from .search import KEY, CX_GENERAL, CX_LI
+from .utils import CSE_SEM, OPENAI_LIMITER, OPENAI_SEM, TTLCache, send_with_retries
 
 # Explicitly load .env file
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+_AUTH_HEADER = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
 
-async def _responses(messages: List[Dict], http: httpx.AsyncClient, json_mode: bool = False, max_tokens: int = 900) -> str:
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.2
+
+# Exact-match response cache: identical prompts (same URL, description, topic) skip the API call
+LLM_CACHE_MAXSIZE = 512
+LLM_CACHE_TTL = 86400  # seconds
+_llm_cache = TTLCache(LLM_CACHE_MAXSIZE, LLM_CACHE_TTL)
+_llm_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+def setLlmCacheBypass(bypass: bool) -> None:
+    """Skip cached LLM responses for the rest of the current request (fresh results are still stored)"""
+    _llm_cache_bypass.set(bypass)
+
+@functools.lru_cache(maxsize=None)
+def _response_format(schema: Type[BaseModel]) -> Dict:
+    # Schemas are static, so build each response_format block once
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "strict": True, "schema": schema.model_json_schema()}
+    }
+
+async def _fetch_completion(messages: List[Dict], http: httpx.AsyncClient, schema: Optional[Type[BaseModel]], max_tokens: int) -> Tuple[str, bool]:
+    """Call the chat completions API; returns (text, complete) where complete means the model stopped on its own"""
     payload = {
-        "model": "gpt-4o-mini",
-        "temperature": 0.2,
+        "model": MODEL,
+        "temperature": TEMPERATURE,
         "max_tokens": max_tokens,
         "messages": messages
     }
-    if json_mode:
-        payload["response_format"] = {"type": "json_object"}
-    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
-    r = await http.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+    if schema:
+        payload["response_format"] = _response_format(schema)
+    # orjson encodes the (multi-KB) prompt payload much faster than httpx's stdlib json
+    body = orjson.dumps(payload)
+    r = await send_with_retries(
+        lambda: http.post("https://api.openai.com/v1/chat/completions", headers=_AUTH_HEADER, content=body),
+        OPENAI_SEM, OPENAI_LIMITER
+    )
     r.raise_for_status()
-    data = r.json()
-    return data.get("output_text") or data.get("choices",[{}])[0].get("message",{}).get("content","")
+    data = orjson.loads(r.content)
+    usage = data.get("usage") or {}
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    print(f"DEBUG: OpenAI prompt tokens: {usage.get('prompt_tokens', 0)} (cached: {cached})")
+    choice = (data.get("choices") or [{}])[0]
+    content = (choice.get("message") or {}).get("content")
+    complete = choice.get("finish_reason") == "stop" and content is not None
+    return data.get("output_text") or content or "", complete
+
+async def _responses(messages: List[Dict], http: httpx.AsyncClient, schema: Optional[Type[BaseModel]] = None, max_tokens: int = 900) -> str:
+    """Chat completion; pass a pydantic `schema` to force strict structured JSON output matching it"""
+    key = hashlib.sha256(orjson.dumps(
+        {"m": messages, "model": MODEL, "temp": TEMPERATURE, "t": max_tokens, "s": schema.__name__ if schema else None},
+        option=orjson.OPT_SORT_KEYS
+    )).hexdigest()
+    if not _llm_cache_bypass.get():
+        hit = _llm_cache.get(key)
+        if hit is not None:
+            return hit
+    text, complete = await _fetch_completion(messages, http, schema, max_tokens)
+    # Only cache complete replies; truncated or refused ones should be retried on the next call
+    if complete:
+        _llm_cache.set(key, text)
+    return text
 
 async def _responses_stream(messages: List[Dict], http: httpx.AsyncClient, max_tokens: int = 900):
     """Stream responses from OpenAI API, yielding chunks as they arrive"""
     payload = {
-        "model": "gpt-4o-mini",
-        "temperature": 0.2,
+        "model": MODEL,
+        "temperature": TEMPERATURE,
         "max_tokens": max_tokens,
         "messages": messages,
         "stream": True
     }
-    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
     
-    async with http.stream("POST", "https://api.openai.com/v1/chat/completions", headers=headers, json=payload) as response:
+    # Streams count toward the per-minute budget but don't hold a concurrency slot for their whole duration
+    await OPENAI_LIMITER.acquire()
+    async with http.stream("POST", "https://api.openai.com/v1/chat/completions", headers=_AUTH_HEADER, content=orjson.dumps(payload)) as response:
         response.raise_for_status()
-        async for line in response.aiter_lines():
-            if line.startswith("data: "):
-                data_str = line[6:]  # Remove "data: " prefix
-                if data_str == "[DONE]":
-                    break
-                try:
-                    data = json.loads(data_str)
-                    delta = data.get("choices", [{}])[0].get("delta", {})
-                    content = delta.get("content", "")
-                    if content:
-                        yield content
-                except json.JSONDecodeError:
-                    continue
+        # Split SSE frames ourselves on raw bytes: cheaper than aiter_lines() + json per token
+        buf = b""
+        async for chunk in response.aiter_bytes():
+            # Normalize CRLF framing; a split "\r" + "\n" pair joins up once the next chunk arrives
+            buf = (buf + chunk).replace(b"\r\n", b"\n")
+            while b"\n\n" in buf:
+                frame, buf = buf.split(b"\n\n", 1)
+                content = _sse_content(frame)
+                if content is None:
+                    return
+                if content:
+                    yield content
+        # Final frame without a trailing blank line
+        content = _sse_content(buf)
+        if content:
+            yield content
+
+def _sse_content(frame: bytes) -> Optional[str]:
+    """Content delta from one SSE frame ("" when it carries none); None means the stream is [DONE]"""
+    for line in frame.split(b"\n"):
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return None
+        try:
+            return orjson.loads(data)["choices"][0]["delta"].get("content") or ""
+        except (orjson.JSONDecodeError, KeyError, IndexError):
+            continue
+    return ""
+
+# Website lookups cached per domain - company descriptions rarely change within a day
+DOMAIN_INFO_CACHE_MAXSIZE = 512
+DOMAIN_INFO_CACHE_TTL = 86400  # seconds
+_domain_info_cache = TTLCache(DOMAIN_INFO_CACHE_MAXSIZE, DOMAIN_INFO_CACHE_TTL)
+
+async def _search_domain_info(domain: str, http: httpx.AsyncClient) -> str:
+    """Use Google Search API to get information about a domain"""
+    # Search for information about the company/website
+    search_query = f'"{domain}" company "what does" OR "about" OR "services"'
+    cx = CX_GENERAL
+    
+    if not cx:
+        # Fallback: use LinkedIn CSE but search more broadly
+        cx = CX_LI
+        search_query = f"{domain} company about"
+    
+    params = {
+        "key": KEY,
+        "cx": cx,
+        "q": search_query,
+        "num": "3"
+    }
+    
+    r = await send_with_retries(lambda: http.get("https://www.googleapis.com/customsearch/v1", params=params), CSE_SEM)
+    r.raise_for_status()
+    data = r.json()
+    
+    # Extract snippets from search results
+    snippets = []
+    for item in data.get("items", [])[:3]:
+        title = item.get("title", "")
+        snippet = item.get("snippet", "")
+        if snippet:
+            snippets.append(f"{title}: {snippet}")
+    
+    return "\n".join(snippets) if snippets else "No search results found for this website"
 
 async def _search_website_info(url: str, http: httpx.AsyncClient) -> str:
-    """Use Google Search API to get information about a website"""
+    """Get search information about a website, cached by domain so different paths share a lookup"""
+    # Extract domain name for search
+    domain = url.replace('https://', '').replace('http://', '').replace('www.', '').split('/')[0].lower()
+    
+    hit = None if _llm_cache_bypass.get() else _domain_info_cache.get(domain)
+    if hit is not None:
+        return hit
+    
     try:
-        # Extract domain name for search
-        domain = url.replace('https://', '').replace('http://', '').replace('www.', '').split('/')[0]
-        
-        # Search for information about the company/website
-        search_query = f'"{domain}" company "what does" OR "about" OR "services"'
-        
-        KEY = os.getenv("GOOGLE_CSE_KEY", "")
-        
-        # We need a general web search engine ID for this to work
-        # For now, let's try to get a general web custom search engine
-        # You'll need to create a general web CSE at https://cse.google.com/
-        GENERAL_CSE_ID = os.getenv("GOOGLE_CSE_CX_GENERAL", "")
-        
-        if not GENERAL_CSE_ID:
-            # Fallback: use LinkedIn CSE but search more broadly
-            GENERAL_CSE_ID = os.getenv("GOOGLE_CSE_CX_LINKEDIN", "")
-            search_query = f"{domain} company about"
-        
-        params = {
-            "key": KEY,
-            "cx": GENERAL_CSE_ID,
-            "q": search_query,
-            "num": "3"
-        }
-        
-        r = await http.get("https://www.googleapis.com/customsearch/v1", params=params)
-        r.raise_for_status()
-        data = r.json()
-        
-        # Extract snippets from search results
-        snippets = []
-        for item in data.get("items", [])[:3]:
-            title = item.get("title", "")
-            snippet = item.get("snippet", "")
-            if snippet:
-                snippets.append(f"{title}: {snippet}")
-        
-        return "\n".join(snippets) if snippets else "No search results found for this website"
-        
+        info = await _search_domain_info(domain, http)
     except Exception as e:
-        # If search fails, fall back to LLM knowledge
+        # If search fails, fall back to LLM knowledge (not cached, so the next request retries)
         return f"Unable to search for current information. Using available knowledge about {url}"
+    
+    _domain_info_cache.set(domain, info)
+    return info
+
+# --- system prompts ---
+# Kept static (no interpolation) so every call shares a byte-identical prefix
+# that OpenAI's automatic prompt caching can reuse. Per-call data goes in the user message.
+DESCRIBE_FROM_KNOWLEDGE_PROMPT = "Based on your knowledge, provide an accurate, objective summary of what this company/product does in 4-6 short sentences. Focus on their core business, products, or services. Be factual and neutral. If you don't have specific knowledge, say so."
+
+DESCRIBE_FROM_SEARCH_PROMPT = "Based on the search results provided, create an accurate, objective summary of what this company/product does in 4-6 short sentences. Focus on their core business, products, or services. Be factual and neutral based on the search information."
+
+EXTRACT_DETAILS_PROMPT = (
+    "Based on the product description, identify the target customer segment and the pain points the product solves. Return JSON {\"customer_segment\": string, \"pain_points\": [...]}."
+    "\n\ncustomer_segment: identify the primary target customer segment. Be specific about whether this is B2B (business-to-business), B2C (business-to-consumer), or B2B2C (business-to-business-to-consumer). Also specify the specific type of customers (e.g., 'Small to medium businesses', 'Enterprise companies', 'Individual consumers', 'Content creators', 'Developers', etc.). Keep it to 1-2 sentences."
+    "\n\npain_points: extract 3-5 key pain points or problems that this product solves for customers. Focus on the customer's struggles, challenges, and frustrations - NOT product features. Each pain point should be a concise phrase (5-10 words)."
+    "\n\nGood pain point examples:\n- 'Wasting time on manual data entry'\n- 'Struggling to collaborate across time zones'\n- 'Losing leads due to slow response times'\n- 'Spending too much on multiple disconnected tools'"
+    "\n\nBad pain point examples (too feature-focused):\n- 'AI-powered automation'\n- 'Cloud-based platform'\n- 'Real-time notifications'"
+)
+
+GTM_TOPICS_PROMPT = (
+    "Generate 5 GTM topics focused on customer pain points and problems this product solves, not product features. Think about what struggles, frustrations, and challenges potential customers face that this product addresses. Return JSON {\"topics\":[...]}."
+    "\n\nFocus on:\n- Problems people face (not product features)\n- Frustrations this eliminates\n- Challenges this addresses\n- Struggles this makes easier"
+    "\n\nExamples of GOOD pain-focused topics:\n- 'Learning to Code Struggles'\n- 'Remote Work Collaboration Challenges'\n- 'Development Environment Setup Headaches'\n- 'Getting Started with Programming Barriers'"
+    "\n\nExamples of BAD feature-focused topics:\n- 'Online Coding Platforms'\n- 'Web-Based IDEs'\n- 'Multi-Language Support'"
+)
+
+SEARCH_KEYWORDS_PROMPT = (
+    'Generate 6-8 search queries to find BUSINESS BUYERS and DECISION-MAKERS who are actively evaluating or purchasing solutions for their company/team. Target people with BUDGET and AUTHORITY, not hobbyists or students. Focus on B2B buying intent. Return JSON {"queries":[...]} format.'
+    "\n\nTarget BUSINESS DECISION-MAKERS who are:\n- Evaluating solutions for their company/team (\"looking for [solution] for our company\")\n- Comparing enterprise/business tools (\"Salesforce vs HubSpot for enterprise\")\n- Have budget to spend (\"best paid tool\", \"enterprise solution\")\n- Making purchasing decisions (\"recommend for our team\", \"company looking for\")\n- Switching vendors/tools (\"migrating from\", \"replacing our current\")\n- Experiencing business pain points (\"our team struggles with\", \"company needs\")"
+    "\n\nPRIORITIZE queries with:\n- \"for our company/team/business\"\n- \"enterprise\" or \"professional\"\n- Vendor/tool comparisons\n- \"looking to buy/purchase\"\n- \"budget for\"\n- Department/role mentions (\"for marketing team\", \"sales needs\")"
+    "\n\nAVOID queries about:\n- Learning/tutorials (\"how to learn\", \"beginner guide\")\n- Personal/hobby use (\"for my side project\")\n- Free alternatives only\n- Student/academic use"
+    "\n\nExamples:\n- \"CRM for small business looking to upgrade\"\n- \"enterprise project management tool alternatives\"\n- \"our team needs better collaboration software\"\n- \"switching from Slack to something better for remote team\""
+)
+
+FILTER_POSTS_PROMPT = (
+    "Filter posts for BUSINESS BUYERS with PURCHASING POWER who are actively evaluating or buying solutions for their company/team. ONLY keep posts from people who appear to have BUDGET and DECISION-MAKING AUTHORITY. Items are numbered [id]. Return JSON {\"results\":[...]} with one object per item, where each object has keys: id (the item's number), keep (boolean), reason (string, under 10 words)."
+    "\n\n✅ KEEP posts from BUSINESS BUYERS who:\n- Mention their company/team/organization (\"our company\", \"my team\", \"we need\")\n- Have decision-making authority (\"I'm evaluating\", \"looking to purchase\", \"we're switching\")\n- Comparing business/enterprise tools (not hobby projects)\n- Express business pain points (\"our team struggles\", \"costing us money/time\")\n- Mention budget/investment (\"willing to pay\", \"best paid solution\", \"enterprise tier\")\n- Reference business context (\"for our sales team\", \"marketing department needs\")\n- Are actively shopping (\"comparing vendors\", \"need recommendations for [business use]\")"
+    "\n\n❌ EXCLUDE posts from:\n- Students or learners (\"learning\", \"homework\", \"school project\")\n- Hobbyists or personal projects (\"my side project\", \"just for fun\")\n- People only wanting free solutions (\"free alternatives only\")\n- Tutorial seekers (\"how to\", \"tutorial\", \"getting started\")\n- General discussions without buying intent\n- News/announcements without evaluation context\n- Academic/research use (\"for my thesis\", \"university\")"
+    "\n\n🎯 SIGNALS OF BUSINESS BUYER:\n- Uses \"we\", \"our\", \"team\", \"company\" language\n- Mentions specific business problems/costs\n- Comparing paid/enterprise tools\n- References existing vendors they're using\n- Asks about implementation, migration, support\n- Mentions stakeholders, budget, procurement"
+)
+
+REPLY_PROMPT = "Write a concise, non-spammy public reply (2–3 sentences), helpful and respectful. Markdown only."
 
 # --- your function names ---
 async def llmGetAppDescriptionFromWebsite(url: str, http: httpx.AsyncClient) -> str:
@@ -103,99 +222,91 @@ async def llmGetAppDescriptionFromWebsite(url: str, http: httpx.AsyncClient) ->
     if "Unable to search" in search_info or "Search failed" in search_info:
         # Fallback to LLM knowledge if search fails
         return await _responses([
-            {"role":"system","content":"Based on your knowledge, provide an accurate, objective summary of what this company/product does in 4-6 short sentences. Focus on their core business, products, or services. Be factual and neutral. If you don't have specific knowledge, say so."},
+            {"role":"system","content":DESCRIBE_FROM_KNOWLEDGE_PROMPT},
             {"role":"user","content":f"Website: {url}\nDescribe what this company/product does based on your knowledge."}
         ], http)
     else:
         # Use search results
         return await _responses([
-            {"role":"system","content":"Based on the search results provided, create an accurate, objective summary of what this company/product does in 4-6 short sentences. Focus on their core business, products, or services. Be factual and neutral based on the search information."},
+            {"role":"system","content":DESCRIBE_FROM_SEARCH_PROMPT},
             {"role":"user","content":f"Website: {url}\n\nSearch Results:\n{search_info}\n\nBased on these search results, describe what this company/product does."}
         ], http)
 
+async def llmExtractSegmentAndPains(description: str, http: httpx.AsyncClient) -> ExtractDetails:
+    """Customer segment and pain points in one call, so the description is only sent once"""
+    text = await _responses([
+        {"role":"system","content":EXTRACT_DETAILS_PROMPT},
+        {"role":"user","content":f"Product description: {description}\n\nWhat customer segment is this best suited for, and what pain points does it solve? Focus on customer problems, not features."}
+    ], http, schema=ExtractDetails)
+    try:
+        return ExtractDetails.model_validate_json(text)
+    except ValidationError:
+        return ExtractDetails(customer_segment="", pain_points=[])
+
 async def llmAnalyzeCustomerSegment(description: str, http: httpx.AsyncClient) -> str:
-    return await _responses([
-        {"role":"system","content":"Based on the product description, identify the primary target customer segment. Be specific about whether this is B2B (business-to-business), B2C (business-to-consumer), or B2B2C (business-to-business-to-consumer). Also specify the specific type of customers (e.g., 'Small to medium businesses', 'Enterprise companies', 'Individual consumers', 'Content creators', 'Developers', etc.). Keep response to 1-2 sentences."},
-        {"role":"user","content":f"Product description: {description}\nWhat customer segment is this best suited for?"}
-    ], http)
+    return (await llmExtractSegmentAndPains(description, http)).customer_segment
 
 async def llmExtractPainPoints(description: str, http: httpx.AsyncClient) -> List[str]:
-    text = await _responses([
-        {"role":"system","content":"Extract 3-5 key pain points or problems that this product solves for customers. Focus on the customer's struggles, challenges, and frustrations - NOT product features. Return as JSON array of strings. Each pain point should be a concise phrase (5-10 words)."},
-        {"role":"user","content":f"Product description: {description}\n\nWhat pain points does this product solve? Focus on customer problems, not features.\n\nGood examples:\n- 'Wasting time on manual data entry'\n- 'Struggling to collaborate across time zones'\n- 'Losing leads due to slow response times'\n- 'Spending too much on multiple disconnected tools'\n\nBad examples (too feature-focused):\n- 'AI-powered automation'\n- 'Cloud-based platform'\n- 'Real-time notifications'"}
-    ], http, json_mode=True)
-    try:
-        data = json.loads(text)
-        if isinstance(data, list):
-            return data
-        elif isinstance(data, dict):
-            # Handle different response formats
-            return data.get('pain_points', data.get('points', data.get('items', [])))
-        return []
-    except:
-        return []
+    return (await llmExtractSegmentAndPains(description, http)).pain_points
 
 async def llmGenerateGtmTopicForApp(description: str, http: httpx.AsyncClient) -> List[str]:
     text = await _responses([
-        {"role":"system","content":"Generate 5 GTM topics focused on customer pain points and problems this product solves, not product features. Think about what struggles, frustrations, and challenges potential customers face that this product addresses. Format as JSON array of strings."},
-        {"role":"user","content":f"Product: {description}\n\nWhat customer pain points does this solve? Focus on:\n- Problems people face (not product features)\n- Frustrations this eliminates\n- Challenges this addresses\n- Struggles this makes easier\n\nExamples of GOOD pain-focused topics:\n- 'Learning to Code Struggles'\n- 'Remote Work Collaboration Challenges'\n- 'Development Environment Setup Headaches'\n- 'Getting Started with Programming Barriers'\n\nExamples of BAD feature-focused topics:\n- 'Online Coding Platforms'\n- 'Web-Based IDEs'\n- 'Multi-Language Support'"}
-    ], http, json_mode=True)
-    try: 
-        result = json.loads(text)
-        # Handle if it returns an object with topics key
-        if isinstance(result, dict) and 'topics' in result:
-            return result['topics']
-        elif isinstance(result, list):
-            return result
-        else:
-            return []
-    except: return []
+        {"role":"system","content":GTM_TOPICS_PROMPT},
+        {"role":"user","content":f"Product: {description}\n\nWhat customer pain points does this solve?"}
+    ], http, schema=TopicsOut)
+    try:
+        return TopicsOut.model_validate_json(text).topics
+    except ValidationError:
+        return []
 
 async def llmGenerateSearchKeywords(topic: str, description: str, http: httpx.AsyncClient) -> List[str]:
     text = await _responses([
-        {"role":"system","content":'Generate 6-8 search queries to find BUSINESS BUYERS and DECISION-MAKERS who are actively evaluating or purchasing solutions for their company/team. Target people with BUDGET and AUTHORITY, not hobbyists or students. Focus on B2B buying intent. Return JSON {"queries":[...]} format.'},
-        {"role":"user","content":f"GTM Topic: {topic}\nProduct: {description}\n\nTarget BUSINESS DECISION-MAKERS who are:\n- Evaluating solutions for their company/team (\"looking for [solution] for our company\")\n- Comparing enterprise/business tools (\"Salesforce vs HubSpot for enterprise\")\n- Have budget to spend (\"best paid tool\", \"enterprise solution\")\n- Making purchasing decisions (\"recommend for our team\", \"company looking for\")\n- Switching vendors/tools (\"migrating from\", \"replacing our current\")\n- Experiencing business pain points (\"our team struggles with\", \"company needs\")\n\nPRIORITIZE queries with:\n- \"for our company/team/business\"\n- \"enterprise\" or \"professional\"\n- Vendor/tool comparisons\n- \"looking to buy/purchase\"\n- \"budget for\"\n- Department/role mentions (\"for marketing team\", \"sales needs\")\n\nAVOID queries about:\n- Learning/tutorials (\"how to learn\", \"beginner guide\")\n- Personal/hobby use (\"for my side project\")\n- Free alternatives only\n- Student/academic use\n\nExamples:\n- \"CRM for small business looking to upgrade\"\n- \"enterprise project management tool alternatives\"\n- \"our team needs better collaboration software\"\n- \"switching from Slack to something better for remote team\""}
-    ], http, json_mode=True)
-    try: return json.loads(text).get("queries",[])
-    except: return []
+        {"role":"system","content":SEARCH_KEYWORDS_PROMPT},
+        {"role":"user","content":f"GTM Topic: {topic}\nProduct: {description}"}
+    ], http, schema=QueriesOut)
+    try:
+        return QueriesOut.model_validate_json(text).queries
+    except ValidationError:
+        return []
 
-async def llmFilterPosts(topic: str, items: List[Dict[str,str]], http: httpx.AsyncClient) -> List[JudgeItem]:
+# Posts per judge call - small batches keep the model accurate and the JSON short enough not to truncate.
+# Verdicts reference items by number, so output is ~25 tokens per item regardless of URL length.
+# The budget leaves headroom because the schema can't enforce the reason's length, and an
+# overrun truncates the whole batch into the keep-all fallback. max_tokens is a cap, not a charge.
+FILTER_BATCH_SIZE = 10
+FILTER_TOKENS_PER_ITEM = 40
+FILTER_TOKENS_OVERHEAD = 20  # {"results":[...]} wrapper
+
+async def _filterBatch(topic: str, batch: List[Dict[str,str]], http: httpx.AsyncClient) -> List[JudgeItem]:
+    """Judge one batch; returned ids index into `batch`"""
     text = await _responses([
-        {"role":"system","content":"Filter posts for BUSINESS BUYERS with PURCHASING POWER who are actively evaluating or buying solutions for their company/team. ONLY keep posts from people who appear to have BUDGET and DECISION-MAKING AUTHORITY. You MUST return a JSON array (list) of objects, where each object has keys: url, keep (boolean), reason (string). Even if there is only one item, wrap it in an array: [{...}]."},
-        {"role":"user","content":f"GTM Topic: {topic}\n\n✅ KEEP posts from BUSINESS BUYERS who:\n- Mention their company/team/organization (\"our company\", \"my team\", \"we need\")\n- Have decision-making authority (\"I'm evaluating\", \"looking to purchase\", \"we're switching\")\n- Comparing business/enterprise tools (not hobby projects)\n- Express business pain points (\"our team struggles\", \"costing us money/time\")\n- Mention budget/investment (\"willing to pay\", \"best paid solution\", \"enterprise tier\")\n- Reference business context (\"for our sales team\", \"marketing department needs\")\n- Are actively shopping (\"comparing vendors\", \"need recommendations for [business use]\")\n\n❌ EXCLUDE posts from:\n- Students or learners (\"learning\", \"homework\", \"school project\")\n- Hobbyists or personal projects (\"my side project\", \"just for fun\")\n- People only wanting free solutions (\"free alternatives only\")\n- Tutorial seekers (\"how to\", \"tutorial\", \"getting started\")\n- General discussions without buying intent\n- News/announcements without evaluation context\n- Academic/research use (\"for my thesis\", \"university\")\n\n🎯 SIGNALS OF BUSINESS BUYER:\n- Uses \"we\", \"our\", \"team\", \"company\" language\n- Mentions specific business problems/costs\n- Comparing paid/enterprise tools\n- References existing vendors they're using\n- Asks about implementation, migration, support\n- Mentions stakeholders, budget, procurement\n\nItems to evaluate:\n" + "\n\n".join([f"Title: {i['title']}\nSnippet: {i['snippet']}\nURL: {i['url']}" for i in items])}
-    ], http, json_mode=True, max_tokens=1500)
+        {"role":"system","content":FILTER_POSTS_PROMPT},
+        {"role":"user","content":f"GTM Topic: {topic}\n\nItems to evaluate:\n" + "\n\n".join([f"[{n}] Title: {i['title']}\nSnippet: {i['snippet']}\nURL: {i['url']}" for n, i in enumerate(batch)])}
+    ], http, schema=JudgeOut, max_tokens=FILTER_TOKENS_OVERHEAD + FILTER_TOKENS_PER_ITEM * len(batch))
     try:
-        data = json.loads(text)
-        if isinstance(data, list):
-            return [JudgeItem(**d) for d in data]
-        elif isinstance(data, dict):
-            # Handle case where response is wrapped in an object with various keys
-            if 'results' in data:
-                return [JudgeItem(**d) for d in data['results']]
-            elif 'items' in data:
-                return [JudgeItem(**d) for d in data['items']]
-            # Handle case where LLM returns a single object instead of array
-            elif 'url' in data and 'keep' in data:
-                return [JudgeItem(**data)]
-            else:
-                return []
-        else:
-            return []
+        # Drop ids that don't refer to an item in this batch
+        return [j for j in JudgeOut.model_validate_json(text).results if 0 <= j.id < len(batch)]
     except Exception as e:
-        # If filtering fails, keep all posts
+        # If filtering fails, keep all posts in this batch
         print(f"ERROR in llmFilterPosts: {e}")
-        return [JudgeItem(url=item['url'], keep=True, reason="Filter failed, keeping all") for item in items]
+        return [JudgeItem(id=n, keep=True, reason="Filter failed, keeping all") for n in range(len(batch))]
+
+async def llmFilterPosts(topic: str, items: List[Dict[str,str]], http: httpx.AsyncClient) -> List[JudgeItem]:
+    """Judge items in concurrent batches; each returned JudgeItem.id is an index into `items`"""
+    offsets = range(0, len(items), FILTER_BATCH_SIZE)
+    results = await asyncio.gather(*[_filterBatch(topic, items[o:o + FILTER_BATCH_SIZE], http) for o in offsets])
+    return [j.model_copy(update={"id": o + j.id}) for o, batch in zip(offsets, results) for j in batch]
 
 async def llmGenerateResponse(topic: str, post: Dict[str,str], http: httpx.AsyncClient) -> str:
     return await _responses([
-        {"role":"system","content":"Write a concise, non-spammy public reply (2–3 sentences), helpful and respectful. Markdown only."},
+        {"role":"system","content":REPLY_PROMPT},
         {"role":"user","content":f"Topic: {topic}\nTitle: {post.get('title')}\nSnippet: {post.get('snippet')}\nURL: {post.get('url')}"}
     ], http)
 
 async def llmGenerateResponseStream(topic: str, post: Dict[str,str], http: httpx.AsyncClient):
     """Stream response generation for real-time UX"""
     async for chunk in _responses_stream([
-        {"role":"system","content":"Write a concise, non-spammy public reply (2–3 sentences), helpful and respectful. Markdown only."},
+        {"role":"system","content":REPLY_PROMPT},
         {"role":"user","content":f"Topic: {topic}\nTitle: {post.get('title')}\nSnippet: {post.get('snippet')}\nURL: {post.get('url')}"}
     ], http):
         yield chunk
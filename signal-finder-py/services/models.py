@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, ConfigDict, HttpUrl
 from typing import List, Literal, Optional, Dict
 
 Source = Literal["linkedin", "reddit", "x"]
@@ -47,7 +47,26 @@ class ReplyResp(BaseModel):
     response: str
 
 class JudgeItem(BaseModel):
-    url: str
+    model_config = ConfigDict(extra="forbid")
+    id: int  # index of the judged item, so the model never has to echo URLs back
     keep: bool    
     reason: str
 
+# --- LLM structured output schemas (OpenAI strict json_schema) ---
+class ExtractDetails(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    customer_segment: str
+    pain_points: List[str]
+
+class TopicsOut(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    topics: List[str]
+
+class QueriesOut(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    queries: List[str]
+
+class JudgeOut(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    results: List[JudgeItem]
+
@@ -1,62 +1,154 @@
+import heapq
+import operator
+import re
 from datetime import datetime, timezone
-from typing import List
+from typing import FrozenSet, List, Literal, Optional, Tuple
 from .models import Post
 
-def heuristic_intent_score(post: Post, query_terms: List[str]) -> float:
+# Buying intent keywords - compiled once into a single alternation so each post is scanned once
+BUYING_SIGNALS = [
+    "our company", "our team", "we need", "looking for", 
+    "recommend", " vs ", "alternative", "switching from", 
+    "for our", "enterprise", "business", "comparing",
+    "evaluation", "migrating", "replacing our"
+]
+_BUYING_SIGNALS_RE = re.compile("|".join(re.escape(s) for s in BUYING_SIGNALS))
+_WORD_RE = re.compile(r"\w+")
+
+# Filler words that show up in generated queries ("best CRM for our team") and in almost
+# every post, so matching them says nothing about relevance
+STOPWORDS = frozenset({
+    "and", "the", "for", "our", "how", "what", "which", "who", "why", "with", "you", "your",
+    "are", "can", "any", "that", "this", "from", "best", "top", "good", "team", "need",
+    "looking", "tool", "tools", "app", "apps", "software", "alternative", "alternatives",
+})
+
+# Term hits stop counting past this, so a keyword-stuffed title can't outscore intent
+MAX_TERM_SCORE = 2.0
+
+# Evidence strong enough to skip the judge: an organisation actively buying or evaluating
+STRONG_BUYING_SIGNALS = [
+    "our company", "our team", "our business", "our org", "we need", "we're evaluating",
+    "we are evaluating", "evaluating", "switching from", "migrating from", "replacing our",
+    "procurement", "vendor", "vendors", "budget", "rfp",
+]
+_STRONG_BUYING_RE = re.compile(r"\b(?:" + "|".join(re.escape(s) for s in STRONG_BUYING_SIGNALS) + r")\b")
+
+# Students, hobbyists and free-tier hunters - never auto-keep these, let the judge decide
+NON_BUYER_SIGNALS = [
+    "learn", "learning", "student", "students", "homework", "school", "university", "college",
+    "class project", "thesis", "side project", "personal project", "hobby", "tutorial",
+    "beginner", "free", "for my",
+]
+_NON_BUYER_RE = re.compile(r"\b(?:" + "|".join(re.escape(s) for s in NON_BUYER_SIGNALS) + r")\b")
+
+# Source detection in one scan; group index selects the score (Reddit > LinkedIn > Twitter)
+_SRC_RE = re.compile(r"(reddit\.com)|(linkedin\.com)|(x\.com|twitter\.com)")
+_SRC_SCORES = (1.5, 1.0, 0.7)
+
+def _words(text: str) -> FrozenSet[str]:
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+def relevance_score(post: Post, query_terms: FrozenSet[str]) -> float:
     """
-    Calculate a deterministic intent score for a post based on:
-    - Source quality (Reddit > LinkedIn > Twitter)
-    - Recency (newer posts get higher scores)
+    Content-only part of the intent score:
     - Query term matching (title > snippet)
     - Buying intent keywords
     """
     score = 0.0
     
+    # Query term matching - strong relevance signal
+    title = (post.title or "").lower()
+    snippet = (post.snippet or "").lower()
+    
+    term_score = 0.8 * len(_words(title) & query_terms)    # Title match is very relevant
+    term_score += 0.4 * len(_words(snippet) & query_terms)  # Snippet match is good
+    score += min(term_score, MAX_TERM_SCORE)
+    
+    # Buying intent keywords boost (only count once)
+    if _BUYING_SIGNALS_RE.search(f"{title} {snippet}"):
+        score += 0.5
+    
+    return score
+
+def heuristic_intent_score(post: Post, query_terms: FrozenSet[str], now: Optional[datetime] = None, relevance: Optional[float] = None) -> float:
+    """
+    Calculate a deterministic intent score for a post based on:
+    - Source quality (Reddit > LinkedIn > Twitter)
+    - Recency (newer posts get higher scores)
+    - Content relevance (see relevance_score)
+    
+    Pass `now` when scoring a batch so every post is aged against the same clock,
+    and `relevance` if it was already computed for this post.
+    """
+    score = relevance_score(post, query_terms) if relevance is None else relevance
+    
     # Source quality - Reddit has best buyer intent discussions
-    url_str = str(post.url).lower()
-    if "reddit.com" in url_str: 
-        score += 1.5
-    elif "linkedin.com" in url_str: 
-        score += 1.0
-    elif "x.com" in url_str or "twitter.com" in url_str: 
-        score += 0.7
+    m = _SRC_RE.search(str(post.url).lower())
+    if m:
+        score += _SRC_SCORES[m.lastindex - 1]
     
     # Recency boost - newer posts are more valuable
     if hasattr(post, 'ts') and post.ts:
         try:
             post_date = datetime.fromisoformat(post.ts.replace('Z', '+00:00'))
-            days_old = (datetime.now(timezone.utc) - post_date).days
+            days_old = ((now or datetime.now(timezone.utc)) - post_date).days
             # Posts within 6 months get declining boost (0-2 points)
             if days_old < 180:
                 score += max(0, 2.0 * (1 - days_old / 180))
         except:
             pass
     
-    # Query term matching - strong relevance signal
+    return score
+
+
+# LLM cascade bands: "keep" and "drop" skip the judge, "judge" goes to the LLM.
+# Relevance alone can't justify keeping a post (term overlap is cheap to hit), so
+# auto-keep needs explicit buying evidence. The source bonus is never used, since
+# CSE posts have no ts and it would otherwise decide the bands.
+AUTO_DROP_RELEVANCE = 0.4  # below: drop without LLM (no query term or buying signal at all)
+Band = Literal["keep", "judge", "drop"]
+
+
+def cascade_band(post: Post, query_terms: FrozenSet[str], relevance: float) -> Band:
+    """
+    Decide whether a post can skip the LLM judge:
+    - keep: on-topic title plus a strong buying signal, with nothing suggesting a non-buyer
+    - drop: relevance below AUTO_DROP_RELEVANCE
+    - judge: everything else
+    """
+    if relevance < AUTO_DROP_RELEVANCE:
+        return "drop"
     title = (post.title or "").lower()
-    snippet = (post.snippet or "").lower()
+    text = f"{title} {(post.snippet or '').lower()}"
+    if _words(title) & query_terms and _STRONG_BUYING_RE.search(text) and not _NON_BUYER_RE.search(text):
+        return "keep"
+    return "judge"
+
+
+def score_posts_by_intent(posts: List[Post], queries: List[str], top_n: int = 60) -> List[Tuple[float, Band, Post]]:
+    """
+    Score posts using deterministic heuristics and return the top N as
+    (score, band, post) tuples, highest score first. See cascade_band.
     
-    for term in query_terms:
-        term_lower = term.lower()
-        if term_lower in title: 
-            score += 0.8  # Title match is very relevant
-        if term_lower in snippet: 
-            score += 0.4  # Snippet match is good
+    Args:
+        posts: List of posts to rank
+        queries: Search queries used (for term matching)
+        top_n: Number of top posts to return (default 60)
+    """
+    # Extract unique query terms once, skipping short words like "a" / "to" and filler words
+    query_terms = frozenset(t for q in queries for t in _words(q) if len(t) > 2 and t not in STOPWORDS)
     
-    # Buying intent keywords boost
-    buying_signals = [
-        "our company", "our team", "we need", "looking for", 
-        "recommend", " vs ", "alternative", "switching from", 
-        "for our", "enterprise", "business", "comparing",
-        "evaluation", "migrating", "replacing our"
-    ]
-    combined_text = f"{title} {snippet}"
-    for signal in buying_signals:
-        if signal in combined_text:
-            score += 0.5
-            break  # Only count once
+    # Calculate scores against a single reference time
+    now = datetime.now(timezone.utc)
+    scored_posts = []
+    for post in posts:
+        relevance = relevance_score(post, query_terms)
+        score = heuristic_intent_score(post, query_terms, now, relevance)
+        scored_posts.append((score, cascade_band(post, query_terms, relevance), post))
     
-    return score
+    # Select top N by score descending without sorting the whole list
+    return heapq.nlargest(top_n, scored_posts, key=operator.itemgetter(0))
 
 
 def rank_posts_by_intent(posts: List[Post], queries: List[str], top_n: int = 60) -> List[Post]:
@@ -72,18 +164,4 @@ def rank_posts_by_intent(posts: List[Post], queries: List[str], top_n: int = 60)
     Returns:
         Top N posts sorted by intent score (highest first)
     """
-    # Extract all query terms
-    query_terms = []
-    for q in queries:
-        query_terms.extend(q.lower().split())
-    
-    # Calculate scores
-    scored_posts = []
-    for post in posts:
-        score = heuristic_intent_score(post, query_terms)
-        scored_posts.append((score, post))
-    
-    # Sort by score descending and return top N
-    scored_posts.sort(key=lambda x: x[0], reverse=True)
-    return [post for score, post in scored_posts[:top_n]]
-
+    return [post for _, _, post in score_posts_by_intent(posts, queries, top_n)]
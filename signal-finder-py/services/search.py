@@ -1,8 +1,10 @@
+import asyncio
 import os
 import httpx
 from typing import List
 from dotenv import load_dotenv
 from .models import Post
+from .utils import CSE_SEM, TTLCache, send_with_retries
 
 # Load environment variables
 load_dotenv()
@@ -10,49 +12,87 @@ load_dotenv()
 KEY = os.getenv("GOOGLE_CSE_KEY", "")
 CX_LI = os.getenv("GOOGLE_CSE_CX_LINKEDIN", "")
 CX_RD = os.getenv("GOOGLE_CSE_CX_REDDIT", "")
+# General web CSE used for website lookups (services/llm.py); falls back to CX_LI when unset.
+# Create one at https://cse.google.com/
+CX_GENERAL = os.getenv("GOOGLE_CSE_CX_GENERAL", "")
 
-async def _cse(cx: str, q: str, http: httpx.AsyncClient, num: int = 10, start: int = 1) -> dict:
+# In-memory TTL cache of CSE lookups keyed by (cx, q, num, start). Holds the in-flight
+# task, so identical queries in one batch share a request and repeats skip CSE billing.
+CSE_CACHE_MAXSIZE = 1024
+CSE_CACHE_TTL = 600  # seconds
+_cse_cache = TTLCache(CSE_CACHE_MAXSIZE, CSE_CACHE_TTL)
+
+async def _cse_fetch(cx: str, q: str, http: httpx.AsyncClient, num: int, start: int) -> dict:
     params = {"key": KEY, "cx": cx, "q": q, "num": str(num), "start": str(start)}
-    r = await http.get("https://www.googleapis.com/customsearch/v1", params=params)
+    r = await send_with_retries(lambda: http.get("https://www.googleapis.com/customsearch/v1", params=params), CSE_SEM)
     r.raise_for_status()
     return r.json()
 
+async def _cse(cx: str, q: str, http: httpx.AsyncClient, num: int = 10, start: int = 1) -> dict:
+    key = (cx, q, num, start)
+    hit = _cse_cache.get(key)
+    if hit is not None:
+        return await asyncio.shield(hit)
+    
+    task = asyncio.ensure_future(_cse_fetch(cx, q, http, num, start))
+    
+    def _evict_failed(t: asyncio.Future) -> None:
+        # Never cache errors; a later call should retry
+        if t.cancelled() or t.exception() is not None:
+            _cse_cache.discard(key, t)
+    
+    task.add_done_callback(_evict_failed)
+    _cse_cache.set(key, task)
+    # Shield so one cancelled caller doesn't cancel the request other callers share
+    return await asyncio.shield(task)
+
 def _normalize(source: str, data: dict) -> List[Post]:
     items = data.get("items", []) or []
-    out: List[Post] = []
-    for i in items:
-        out.append(Post(
+    # CSE results are already well-formed, so skip Pydantic validation (HttpUrl parsing) on this hot path
+    return [
+        Post.model_construct(
             source=source,
             title=i.get("title") or "",
             url=i.get("link") or "",
-            snippet=i.get("snippet") or ""
-        ))
-    return out
+            snippet=i.get("snippet") or "",
+            ts=None
+        )
+        for i in items
+    ]
 
 # --- your function names ---
 async def searchXApi(queries: List[str], per_query: int, http: httpx.AsyncClient) -> List[Post]:
     # Placeholder: integrate X official API if available; keep signature.
     return []
 
-async def searchLinkedInApi(queries: List[str], per_query: int, http: httpx.AsyncClient) -> List[Post]:
+async def _cse_all(source: str, cx: str, queries: List[str], per_query: int, http: httpx.AsyncClient) -> List[Post]:
+    # Run every query concurrently; a single failed query (e.g. 429) is dropped instead of sinking the batch
+    results = await asyncio.gather(*[_cse(cx, q, http, per_query) for q in queries], return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    if results and len(errors) == len(results):
+        # Every query failed (bad key/cx, exhausted quota): surface it rather than looking like "no results"
+        raise errors[0]
     all_posts: List[Post] = []
-    for q in queries:
-        data = await _cse(CX_LI, q, http, per_query)
-        all_posts.extend(_normalize("linkedin", data))
+    for data in results:
+        if isinstance(data, Exception):
+            print(f"DEBUG: {source} search failed: {data}")
+            continue
+        all_posts.extend(_normalize(source, data))
     return all_posts
 
+async def searchLinkedInApi(queries: List[str], per_query: int, http: httpx.AsyncClient) -> List[Post]:
+    return await _cse_all("linkedin", CX_LI, queries, per_query, http)
+
 async def searchRedditApi(queries: List[str], per_query: int, http: httpx.AsyncClient) -> List[Post]:
-    all_posts: List[Post] = []
-    for q in queries:
-        data = await _cse(CX_RD, q, http, per_query)
-        all_posts.extend(_normalize("reddit", data))
-    return all_posts
+    return await _cse_all("reddit", CX_RD, queries, per_query, http)
 
 async def SearchAllApis(queries: List[str], per_query: int, http: httpx.AsyncClient) -> List[Post]:
     # Prioritize Reddit for better community discussions
-    rd = await searchRedditApi(queries, per_query * 2, http)  # More Reddit results
-    li = await searchLinkedInApi(queries, per_query, http)    # Normal LinkedIn results  
-    x  = await searchXApi(queries, per_query, http)
+    rd, li, x = await asyncio.gather(
+        searchRedditApi(queries, per_query * 2, http),  # More Reddit results
+        searchLinkedInApi(queries, per_query, http),    # Normal LinkedIn results
+        searchXApi(queries, per_query, http),
+    )
     
     # Mix results instead of just concatenating
     mixed_results = []
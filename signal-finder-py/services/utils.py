@@ -1,15 +1,105 @@
-from typing import List
+import asyncio
+import random
+import time
+import httpx
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
 from .models import Post
 
+# --- in-memory caching ---
+class TTLCache:
+    """Bounded LRU mapping whose entries expire `ttl` seconds after they are set"""
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        hit = self._data.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return hit[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def discard(self, key: Hashable, value: Any) -> None:
+        """Remove `key` only if it still maps to `value` (it may have been replaced since)"""
+        hit = self._data.get(key)
+        if hit is not None and hit[1] is value:
+            del self._data[key]
+
+# --- outbound rate limiting ---
+# Parallel fan-out can exceed OpenAI RPM/TPM limits and Google CSE's QPS burst.
+OPENAI_MAX_CONCURRENCY = 20
+OPENAI_MAX_PER_MINUTE = 500
+CSE_MAX_CONCURRENCY = 10
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ATTEMPTS = 4
+RETRY_MAX_WAIT = 30.0  # seconds
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per `period` seconds"""
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+OPENAI_SEM = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+OPENAI_LIMITER = RateLimiter(OPENAI_MAX_PER_MINUTE, 60.0)
+CSE_SEM = asyncio.Semaphore(CSE_MAX_CONCURRENCY)
+
+async def send_with_retries(
+    send: Callable[[], Awaitable[httpx.Response]],
+    sem: asyncio.Semaphore,
+    limiter: Optional[RateLimiter] = None,
+) -> httpx.Response:
+    """
+    Run `send` under `sem` (and `limiter`), retrying 429/5xx responses with
+    exponential backoff plus jitter, honouring Retry-After when present.
+    The last response is returned as-is; callers still raise_for_status().
+    """
+    for attempt in range(RETRY_ATTEMPTS):
+        if limiter:
+            await limiter.acquire()
+        async with sem:
+            r = await send()
+        if r.status_code not in RETRY_STATUSES or attempt == RETRY_ATTEMPTS - 1:
+            return r
+        try:
+            wait = float(r.headers.get("retry-after", ""))
+        except ValueError:
+            wait = 2 ** attempt + random.random()
+        await asyncio.sleep(min(wait, RETRY_MAX_WAIT))
+    return r
+
 def dedupe_by_url(items: List[Post]) -> List[Post]:
-    seen = set()
-    out: List[Post] = []
+    # Key ignores query string, fragment and trailing slash; first post per key wins
+    seen: Dict[str, Post] = {}
     for i in items:
-        key = str(i.url).split("?")[0]
-        if key not in seen:
-            seen.add(key)
-            out.append(i)
-    return out
+        key = str(i.url).split("?", 1)[0].split("#", 1)[0].rstrip("/")
+        seen.setdefault(key, i)
+    return list(seen.values())
 
 def simple_overlap_score(query: str, p: Post) -> float:
     terms = [t for t in query.lower().split() if t.strip()]
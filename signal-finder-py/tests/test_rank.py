@@ -0,0 +1,32 @@
+import pytest
+
+from services.models import Post
+from services.rank import score_posts_by_intent
+
+QUERIES = ["best CRM for small business", "CRM alternative for our team"]
+
+# (title, snippet, expected band) - labelled by hand. The student/university posts used to be
+# auto-kept because they matched the queries on filler words ("for", "my", "team", "best").
+LABELLED = [
+    ("Our company is switching from Salesforce, need a CRM for 40 reps",
+     "Budget approved, shortlisting vendors this month", "keep"),
+    ("How to learn CRM for my side project? Looking for free alternatives",
+     "I'm a student and just want to try things out", "judge"),
+    ("Best free project management tool for my university team",
+     "Any recommendations for a class project?", "judge"),
+    ("We're evaluating Salesforce vs HubSpot",
+     "Procurement asked me to compare vendors", "judge"),
+    ("My cat learned to open doors", "Video inside", "drop"),
+]
+
+
+def _band(title: str, snippet: str) -> str:
+    post = Post(source="reddit", title=title, url="https://www.reddit.com/r/x/1", snippet=snippet)
+    [(_, band, _)] = score_posts_by_intent([post], QUERIES)
+    return band
+
+
+@pytest.mark.parametrize("title,snippet,expected", LABELLED)
+def test_cascade_bands(title, snippet, expected):
+    assert _band(title, snippet) == expected
+